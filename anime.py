@@ -1,3 +1,7 @@
+import time
+
+STARTUP_STARTED = time.perf_counter()
+
 import aiohttp
 from aiogram import Bot, Dispatcher, F
 from aiogram.client.default import DefaultBotProperties
@@ -7,7 +11,8 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import Message, BufferedInputFile, CallbackQuery, InputMediaPhoto, InlineKeyboardButton, \
-    InlineKeyboardMarkup, KeyboardButtonRequestChat
+    InlineKeyboardMarkup, KeyboardButtonRequestChat, InlineQuery, InlineQueryResultArticle, InlineQueryResultsButton, \
+    InputTextMessageContent
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import re
 
@@ -17,30 +22,42 @@ import os
 import aiomysql
 import asyncio
 import logging
-import cv2
 import subprocess
 
 from dotenv import load_dotenv
-from PicImageSearch import Network, Yandex
-from PicImageSearch.model import YandexResponse
-from anime_parsers_ru import ShikimoriParserAsync
 import random
+import sys
+import threading
+import traceback
+import html
+import zlib
+import contextvars
+from collections import Counter, OrderedDict, deque
+from typing import TYPE_CHECKING, Union
+
+# Тяжелые модули (cv2, PicImageSearch, anime_parsers_ru) импортируются при первом
+# использовании или прогреваются в фоне после старта поллинга, см. prewarm()
+if TYPE_CHECKING:
+    from PicImageSearch.model import YandexResponse
 
 # Настройка логгера
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
+startup_logger = logging.getLogger(f"{__name__}.startup")
+startup_logger.setLevel(logging.INFO)
 
-parser = ShikimoriParserAsync()
+parser = None
+cv2 = None
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("ANIME_BOT")
 ADMIN_ID = os.getenv("ADMIN_ID")
 
-bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 BOT_NAME = "Аниме со скриншота"
+SHARE_QUERY = " – бот поиска аниме по скриншоту"
 
 DB_CONFIG = {
     "host": os.getenv("DB_HOST"),
@@ -51,6 +68,34 @@ DB_CONFIG = {
 }
 
 
+def mark_startup(stage: str):
+    """Пишет в лог, сколько прошло от старта процесса до этапа stage"""
+    startup_logger.info(f"Startup: {stage} at {(time.perf_counter() - STARTUP_STARTED) * 1000:.0f} ms")
+
+
+def get_cv2():
+    global cv2
+    if cv2 is None:
+        import cv2 as module
+        cv2 = module
+    return cv2
+
+
+def get_parser():
+    global parser
+    if parser is None:
+        from anime_parsers_ru import ShikimoriParserAsync
+        parser = ShikimoriParserAsync()
+    return parser
+
+
+def prewarm():
+    """Импортирует тяжелые модули заранее, чтобы первый запрос не ждал их загрузки"""
+    get_cv2()
+    import PicImageSearch  # noqa: F401
+    get_parser()
+
+
 class AdminStates(StatesGroup):
     waiting_for_contact_message = State()
 
@@ -67,7 +112,7 @@ async def create_pool():
 
 
 async def init_db():
-    """Создает таблицу users, если она не существует"""
+    """Создает таблицы users и searches, если они не существуют"""
     async with await create_pool() as pool:
         async with pool.acquire() as conn:
             async with conn.cursor() as cursor:
@@ -80,27 +125,144 @@ async def init_db():
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
+                await cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS searches (
+                        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                        user_id BIGINT,
+                        search_type VARCHAR(32),
+                        pipeline VARCHAR(32),
+                        latency_ms INT,
+                        hit BOOLEAN,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        INDEX (created_at)
+                    )
+                """)
                 await conn.commit()
 
 
-async def register_user(user_id: int, username: str, first_name: str, last_name: str):
-    async with await create_pool() as pool:
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute(
-                    "INSERT INTO users (user_id, username, first_name, last_name) "
-                    "VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
-                    "username = VALUES(username), first_name = VALUES(first_name), last_name = VALUES(last_name)",
-                    (user_id, username, first_name, last_name)
-                )
-                await conn.commit()
+class ActivityBuffer:
+    """Write-behind буфер для пользователей и поисковых запросов.
+
+    Хендлеры только кладут записи в память, фоновая задача сбрасывает их в MySQL
+    пачками по таймеру или при заполнении. Размер буфера ограничен: при переполнении
+    отбрасываются самые старые записи."""
+
+    def __init__(self, flush_interval: float = 5.0, batch_size: int = 500, max_pending: int = 10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._users = {}  # user_id -> (user_id, username, first_name, last_name), повторы схлопываются
+        self._searches = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = None
+
+    def add_user(self, user_id: int, username: str, first_name: str, last_name: str):
+        self._users.pop(user_id, None)
+        self._users[user_id] = (user_id, username, first_name, last_name)
+        if len(self._users) > self.max_pending:
+            self._users.pop(next(iter(self._users)))
+            self.dropped += 1
+        self._notify()
+
+    def add_search(self, user_id: int, search_type: str, pipeline: str, latency: float, hit: bool):
+        if len(self._searches) >= self.max_pending:
+            self._searches.popleft()
+            self.dropped += 1
+        self._searches.append((user_id, search_type, pipeline, int(latency * 1000), hit))
+        self._notify()
+
+    def _notify(self):
+        if len(self._users) >= self.batch_size or len(self._searches) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Фоновую задачу не отменяем: она может быть посреди flush() с уже вынутой пачкой
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._users and not self._searches:
+                return
+
+            users = list(self._users.values())
+            searches = list(self._searches)
+            self._users.clear()
+            self._searches.clear()
+
+            try:
+                async with await create_pool() as pool:
+                    async with pool.acquire() as conn:
+                        async with conn.cursor() as cursor:
+                            for i in range(0, len(users), self.batch_size):
+                                batch = users[i:i + self.batch_size]
+                                await cursor.execute(
+                                    "INSERT INTO users (user_id, username, first_name, last_name) VALUES "
+                                    + ", ".join(["(%s, %s, %s, %s)"] * len(batch)) +
+                                    " ON DUPLICATE KEY UPDATE username = VALUES(username), "
+                                    "first_name = VALUES(first_name), last_name = VALUES(last_name)",
+                                    [value for row in batch for value in row]
+                                )
+                            for i in range(0, len(searches), self.batch_size):
+                                batch = searches[i:i + self.batch_size]
+                                await cursor.execute(
+                                    "INSERT INTO searches (user_id, search_type, pipeline, latency_ms, hit) VALUES "
+                                    + ", ".join(["(%s, %s, %s, %s, %s)"] * len(batch)),
+                                    [value for row in batch for value in row]
+                                )
+                            await conn.commit()
+            except Exception as e:
+                logger.error(f"Activity flush error: {e}")
+                self._requeue(users, searches)
+            except BaseException:
+                # Отмена посреди записи: пачку возвращаем в буфер, чтобы ее сохранил следующий flush()
+                self._requeue(users, searches)
+                raise
+
+    def _requeue(self, users: list, searches: list):
+        """Возвращает несохраненные записи в буфер, не затирая более свежие"""
+        for row in users:
+            if row[0] not in self._users and len(self._users) < self.max_pending:
+                self._users[row[0]] = row
+        free = self.max_pending - len(self._searches)
+        if free > 0:
+            self._searches.extendleft(reversed(searches[-free:]))
+        self.dropped += max(0, len(searches) - max(free, 0))
+
+
+activity = ActivityBuffer()
+
+
+def register_user(user_id: int, username: str, first_name: str, last_name: str):
+    activity.add_user(user_id, username, first_name, last_name)
 
 
 def share_bot():
     markup = InlineKeyboardBuilder()
     markup.button(
         text="Поделиться в чате 🚀",
-        switch_inline_query=" – бот поиска аниме по скриншоту"
+        switch_inline_query=SHARE_QUERY
     )
     markup.button(
         text="Задонатить 💰",
@@ -125,7 +287,7 @@ def actions_keyboard():
 
 @dp.message(Command("start"))
 async def cmd_start(message: Message):
-    await register_user(
+    register_user(
         message.from_user.id,
         message.from_user.username,
         message.from_user.first_name,
@@ -144,10 +306,10 @@ async def cmd_start(message: Message):
     )
 
     try:
-        chat = await bot.get_chat(message.chat.id)
+        chat = await message.bot.get_chat(message.chat.id)
         if chat.pinned_message:
-            await bot.unpin_chat_message(message.chat.id)
-        await bot.pin_chat_message(
+            await message.bot.unpin_chat_message(message.chat.id)
+        await message.bot.pin_chat_message(
             chat_id=message.chat.id,
             message_id=pinned_msg.message_id,
             disable_notification=True
@@ -156,20 +318,30 @@ async def cmd_start(message: Message):
         logger.error(f"Не удалось закрепить сообщение: {e}")
 
 
-async def process_image(file_path: str) -> YandexResponse:
+async def process_image(file: Union[str, bytes]) -> "YandexResponse":
+    from PicImageSearch import Network, Yandex
+
     try:
         async with Network() as client:
             yandex = Yandex(client=client)
-            resp = await yandex.search(file=file_path)
+            resp = await yandex.search(file=file)
             return resp
     except Exception as e:
         logger.error(f"Error in Yandex search: {e}")
         return None
 
 
-def create_pagination_keyboard(search_url: str, current_page: int, total_pages: int):
+def result_set_key(search_url: str) -> str:
+    """Короткий ключ поиска для callback_data: по нему кнопка узнает, к какому поиску она относится"""
+    return f"{zlib.crc32(search_url.encode()):08x}"
+
+
+def create_pagination_keyboard(search_url: str, current_page: int, total_pages: int, info_indexes: list = ()):
     builder = InlineKeyboardBuilder()
 
+    for index in info_indexes:
+        builder.button(text=f"ℹ️ Инфо #{index + 1}", callback_data=f"info_{result_set_key(search_url)}_{index}")
+
     if total_pages > 1:
         if current_page > 1:
             builder.button(text="⬅️ Назад", callback_data=f"page_{current_page - 1}")
@@ -178,26 +350,22 @@ def create_pagination_keyboard(search_url: str, current_page: int, total_pages:
 
     builder.button(text="🔍 Все результаты", url=search_url)
 
-    builder.adjust(2, 1)
+    builder.adjust(*([len(info_indexes)] if info_indexes else []), 2, 1)
     return builder.as_markup()
 
 
-async def send_result_page(message: Message, resp: YandexResponse, page: int = 1, items_per_page: int = 3,
-                           edit_message_id: int = None):
-    if not resp or not resp.raw:
-        if edit_message_id:
-            try:
-                await message.bot.edit_message_text(
-                    chat_id=message.chat.id,
-                    message_id=edit_message_id,
-                    text="❌ Не удалось определить аниме. Попробуйте другой скриншот."
-                )
-            except:
-                await message.answer("❌ Не удалось определить аниме. Попробуйте другой скриншот.")
-        else:
-            await message.answer("❌ Не удалось определить аниме. Попробуйте другой скриншот.")
-        return
+TITLE_SEPARATORS = re.compile(r'[-–—]')
+
+
+def clean_title(title: str) -> str:
+    """Отрезает от заголовка результата все после первого тире"""
+    return TITLE_SEPARATORS.split(title, 1)[0].strip()
 
+
+def render_result_page(resp: "YandexResponse", page: int, items_per_page: int):
+    """Собирает текст и медиагруппу страницы результатов.
+
+    Возвращает (текст, медиагруппа, номер страницы, всего страниц, {индекс результата: чистое название})"""
     total_results = len(resp.raw)
     total_pages = (total_results + items_per_page - 1) // items_per_page
     page = max(1, min(page, total_pages))
@@ -206,21 +374,23 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
     end_idx = min(start_idx + items_per_page, total_results)
 
     media_group = []
-    results_text = f"🔍 Результаты поиска (страница {page}/{total_pages}):\n\n"
+    titles = {}
+    text_parts = [f"🔍 Результаты поиска (страница {page}/{total_pages}):\n\n"]
 
     for i, result in enumerate(resp.raw[start_idx:end_idx], start=start_idx + 1):
         if result.title:
-            title_parts = re.split(r'[-–—]', result.title)
-            clean_title = title_parts[0].strip()
+            title = clean_title(result.title)
             original_title = result.title.strip()
+            if title:
+                titles[i - 1] = title
         else:
-            clean_title = 'Без названия'
+            title = 'Без названия'
             original_title = 'Без названия'
 
-        results_text += (
+        text_parts.append(
             f"<b>Результат #{i}</b>\n"
             f"Оригинал: <code>{original_title}</code>\n"
-            f"Чистое: <code>{clean_title}</code>\n"
+            f"Чистое: <code>{title}</code>\n"
             f"🔗 <a href='{result.url}'>Источник</a>\n\n"
         )
 
@@ -231,7 +401,33 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                 parse_mode=ParseMode.HTML
             ))
 
-    results_text += "\n\n<blockquote><b>Скопировать название можно нажатием\nДля поиска аниме по названию используйте /anime</b></blockquote>"
+    text_parts.append("\n\n<blockquote><b>Скопировать название можно нажатием\nДля поиска аниме по названию используйте /anime</b></blockquote>")
+    return "".join(text_parts), media_group, page, total_pages, titles
+
+
+async def send_result_page(message: Message, resp: "YandexResponse", page: int = 1, items_per_page: int = 3,
+                           edit_message_id: int = None, prefetch: bool = True):
+    if not resp or not resp.raw:
+        if edit_message_id:
+            try:
+                await message.bot.edit_message_text(
+                    chat_id=message.chat.id,
+                    message_id=edit_message_id,
+                    text="❌ Не удалось определить аниме. Попробуйте другой скриншот."
+                )
+            except:
+                await message.answer("❌ Не удалось определить аниме. Попробуйте другой скриншот.")
+        else:
+            await message.answer("❌ Не удалось определить аниме. Попробуйте другой скриншот.")
+        return
+
+    results_text, media_group, page, total_pages, titles = render_result_page(resp, page, items_per_page)
+
+    # Пользователи почти всегда ищут «Чистое» название через /anime - прогреваем кеш заранее.
+    # При листании не прогреваем, чтобы не умножать запросы к Shikimori
+    if prefetch:
+        for title in titles.values():
+            shikimori.prefetch(title, message.chat.id)
 
     try:
         if len(media_group) > 1:
@@ -241,7 +437,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                         chat_id=message.chat.id,
                         message_id=edit_message_id,
                         text=results_text,
-                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages),
+                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles)),
                         disable_web_page_preview=True
                     )
                 except:
@@ -254,7 +450,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                     await message.answer_media_group(media_group)
                     msg = await message.answer(
                         results_text,
-                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages),
+                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles)),
                         disable_web_page_preview=True
                     )
                     return msg.message_id
@@ -263,7 +459,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                     retry_after = e.retry_after
                     await message.answer(f"⚠️ Слишком быстро! Подождите {retry_after} секунд...")
                     await asyncio.sleep(retry_after)
-                    return await send_result_page(message, resp, page, items_per_page, edit_message_id)
+                    return await send_result_page(message, resp, page, items_per_page, edit_message_id, prefetch=False)
 
         elif media_group:
             if edit_message_id:
@@ -276,7 +472,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                             caption=results_text,
                             parse_mode=ParseMode.HTML
                         ),
-                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages)
+                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles))
                     )
                     return edit_message_id
                 except:
@@ -287,7 +483,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                     msg = await message.answer_photo(
                         photo=media_group[0].media,
                         caption=results_text,
-                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages),
+                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles)),
                         parse_mode=ParseMode.HTML
                     )
                     return msg.message_id
@@ -295,7 +491,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                     retry_after = e.retry_after
                     await message.answer(f"⚠️ Слишком быстро! Подождите {retry_after} секунд...")
                     await asyncio.sleep(retry_after)
-                    return await send_result_page(message, resp, page, items_per_page, edit_message_id)
+                    return await send_result_page(message, resp, page, items_per_page, edit_message_id, prefetch=False)
 
         else:
             if edit_message_id:
@@ -304,7 +500,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                         chat_id=message.chat.id,
                         message_id=edit_message_id,
                         text=results_text,
-                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages),
+                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles)),
                         disable_web_page_preview=True
                     )
                     return edit_message_id
@@ -315,7 +511,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                 try:
                     msg = await message.answer(
                         results_text,
-                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages),
+                        reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles)),
                         disable_web_page_preview=True
                     )
                     return msg.message_id
@@ -323,7 +519,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                     retry_after = e.retry_after
                     await message.answer(f"⚠️ Слишком быстро! Подождите {retry_after} секунд...")
                     await asyncio.sleep(retry_after)
-                    return await send_result_page(message, resp, page, items_per_page, edit_message_id)
+                    return await send_result_page(message, resp, page, items_per_page, edit_message_id, prefetch=False)
 
     except Exception as e:
         logger.error(f"Error sending results: {e}")
@@ -333,7 +529,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
                     chat_id=message.chat.id,
                     message_id=edit_message_id,
                     text="Произошла ошибка при отправке результатов. Вот текстовая версия:\n\n" + results_text,
-                    reply_markup=create_pagination_keyboard(resp.url, page, total_pages),
+                    reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles)),
                     disable_web_page_preview=True
                 )
                 return edit_message_id
@@ -342,7 +538,7 @@ async def send_result_page(message: Message, resp: YandexResponse, page: int = 1
 
         msg = await message.answer(
             "Произошла ошибка при отправке результатов. Вот текстовая версия:\n\n" + results_text,
-            reply_markup=create_pagination_keyboard(resp.url, page, total_pages),
+            reply_markup=create_pagination_keyboard(resp.url, page, total_pages, list(titles)),
             disable_web_page_preview=True
         )
         return msg.message_id
@@ -368,7 +564,8 @@ async def handle_pagination(callback: CallbackQuery, state: FSMContext):
             callback.message,
             resp,
             page,
-            edit_message_id=last_message_id
+            edit_message_id=last_message_id,
+            prefetch=False
         )
 
         if new_message_id and new_message_id != last_message_id:
@@ -378,22 +575,46 @@ async def handle_pagination(callback: CallbackQuery, state: FSMContext):
 
 
 
+@dp.callback_query(F.data.startswith("info_"))
+async def handle_result_info(callback: CallbackQuery, state: FSMContext):
+    """Кнопка «ℹ️ Инфо» у результата: то же, что /anime с чистым названием"""
+    current_state = await state.get_state()
+    if current_state == AnimeSearchStates.waiting_for_anime_name:
+        await callback.answer("Закончите ввод названия аниме или отмените поиск кнопкой у сообщения", show_alert=True)
+        return
+
+    _, key, index = callback.data.split("_")
+    index = int(index)
+    data = await state.get_data()
+    resp = data.get("yandex_response")
+    # Кнопка со старого сообщения: в состоянии уже результаты другого скриншота
+    if not resp or result_set_key(resp.url) != key or index >= len(resp.raw) or not resp.raw[index].title:
+        await callback.answer("Результаты поиска устарели, отправьте скриншот заново", show_alert=True)
+        return
+
+    await callback.answer()
+    await search_anime_info(callback.message, clean_title(resp.raw[index].title), state, user_id=callback.from_user.id)
+
+
 @dp.message(F.photo)
 async def handle_photo(message: Message, state: FSMContext):
     """Обработчик фотографий"""
     await message.answer("Идет обработка изображения...")
 
+    started = time.monotonic()
+    hit = False
     temp_image_path = None
     try:
         photo = message.photo[-1]
         file_id = photo.file_id
-        file = await bot.get_file(file_id)
+        file = await message.bot.get_file(file_id)
         file_path = file.file_path
 
         temp_image_path = f"temp/photo_{uuid.uuid4()}.jpg"
-        await bot.download_file(file_path, temp_image_path)
+        await message.bot.download_file(file_path, temp_image_path)
 
         resp = await process_image(temp_image_path)
+        hit = bool(resp and resp.raw)
 
         if resp:
             await state.update_data(yandex_response=resp)
@@ -410,6 +631,7 @@ async def handle_photo(message: Message, state: FSMContext):
         logger.error(f"Error processing photo: {e}")
         await message.answer(f"Произошла ошибка при обработке фото: {e}")
     finally:
+        activity.add_search(message.from_user.id, "photo", "yandex", time.monotonic() - started, hit)
         if temp_image_path and os.path.exists(temp_image_path):
             os.remove(temp_image_path)
 
@@ -475,24 +697,88 @@ async def download_tiktok_video(url: str) -> None:
         return None
 
 
-async def extract_first_frame(video_path: str, max_attempts: int = 10) -> str:
-    """Извлекает первый непустой кадр"""
+# Параметры извлечения кадра из видео
+FRAME_SAMPLE_MS = (0, 250, 500, 1000, 2000, 3000, 5000, 8000, 12000, 20000)  # Точки поиска кадра
+FRAME_GRAB_LIMIT = 30  # До скольких кадров вперед выгоднее grab(), чем seek
+FRAME_MAX_SIDE = 1280  # Больше для поиска по картинке не нужно
+FRAME_CHECK_SIDE = 64  # Размер уменьшенной копии для проверок яркости
+FRAME_MIN_BRIGHTNESS = 10
+FRAME_MIN_CONTRAST = 4
+FRAME_JPEG_QUALITY = 90
+
+
+def _frame_is_blank(frame) -> bool:
+    """Проверяет кадр на пустоту (черный/однотонный) по уменьшенной копии"""
+    cv2 = get_cv2()
+    small = cv2.resize(frame, (FRAME_CHECK_SIDE, FRAME_CHECK_SIDE), interpolation=cv2.INTER_NEAREST)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    mean, stddev = cv2.meanStdDev(gray)
+    return mean[0][0] <= FRAME_MIN_BRIGHTNESS or stddev[0][0] < FRAME_MIN_CONTRAST
+
+
+def _encode_frame(frame) -> bytes:
+    """Уменьшает кадр до FRAME_MAX_SIDE и кодирует в JPEG"""
+    cv2 = get_cv2()
+    height, width = frame.shape[:2]
+    scale = FRAME_MAX_SIDE / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY])
+    return buffer.tobytes() if ok else None
+
+
+def _seek_frame(cap, position_ms: int, fps: float):
+    """Переходит к position_ms и декодирует один кадр.
+
+    Небольшие прыжки вперед делаются через grab() без декодирования в BGR,
+    дальние - через seek по времени (до ближайшего ключевого кадра)."""
+    cv2 = get_cv2()
+    current_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+    frames_ahead = (position_ms - current_ms) * fps / 1000 if fps > 0 else -1
+
+    if 0 <= frames_ahead <= FRAME_GRAB_LIMIT:
+        for _ in range(int(frames_ahead)):
+            if not cap.grab():
+                return None
+    elif not cap.set(cv2.CAP_PROP_POS_MSEC, position_ms):
+        return None
+
+    ret, frame = cap.read()
+    return frame if ret else None
+
+
+def _extract_frame(video_path: str, max_attempts: int) -> bytes:
+    cv2 = get_cv2()
+    cap = cv2.VideoCapture(video_path)
     try:
-        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return None
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        duration_ms = frame_count * 1000 / fps if fps > 0 and frame_count > 0 else None
 
-        for i in range(max_attempts):
-            ret, frame = cap.read()
-            if not ret:
+        for position_ms in FRAME_SAMPLE_MS[:max_attempts]:
+            if duration_ms is not None and position_ms >= duration_ms:
                 break
 
-            if cv2.mean(frame)[0] > 10:
-                image_path = f"temp/frame_{uuid.uuid4()}.jpg"
-                cv2.imwrite(image_path, frame)
-                cap.release()
-                return image_path
+            frame = _seek_frame(cap, position_ms, fps)
+            if frame is None:
+                break
+
+            if not _frame_is_blank(frame):
+                return _encode_frame(frame)
 
-        cap.release()
         return None
+    finally:
+        cap.release()
+
+
+async def extract_first_frame(video_path: str, max_attempts: int = 10) -> bytes:
+    """Извлекает первый непустой кадр и возвращает его в виде JPEG"""
+    try:
+        return await asyncio.to_thread(_extract_frame, video_path, max_attempts)
     except Exception as e:
         logger.error(f"Frame extraction error: {e}")
         return None
@@ -502,8 +788,9 @@ async def extract_first_frame(video_path: str, max_attempts: int = 10) -> str:
 async def handle_youtube_shorts(message: Message, state: FSMContext):
     await message.answer("Скачиваю...")
 
+    started = time.monotonic()
+    hit = False
     video_path = None
-    frame_path = None
 
     try:
         video_path = await download_youtube_shorts(message.text)
@@ -513,12 +800,13 @@ async def handle_youtube_shorts(message: Message, state: FSMContext):
 
         await message.answer("Извлекаю первый кадр...")
 
-        frame_path = await extract_first_frame(video_path)
-        if not frame_path:
+        frame = await extract_first_frame(video_path)
+        if not frame:
             await message.answer("Не удалось извлечь кадр из видео.")
             return
 
-        resp = await process_image(frame_path)
+        resp = await process_image(frame)
+        hit = bool(resp and resp.raw)
         if resp:
             await state.update_data(yandex_response=resp)
             await send_result_page(message, resp)
@@ -529,17 +817,17 @@ async def handle_youtube_shorts(message: Message, state: FSMContext):
         logger.error(f"Error processing YouTube Shorts: {e}")
         await message.answer(f"Ошибка: {str(e)}")
     finally:
+        activity.add_search(message.from_user.id, "shorts", "yt-dlp+yandex", time.monotonic() - started, hit)
         if video_path and os.path.exists(video_path):
             os.remove(video_path)
-        if frame_path and os.path.exists(frame_path):
-            os.remove(frame_path)
 
 @dp.message(F.text.contains("tiktok.com"))
 async def handle_tiktok_url(message: Message, state: FSMContext):
     await message.answer("Скачиваю видео из TikTok...")
 
+    started = time.monotonic()
+    hit = False
     video_path = None
-    frame_path = None
 
     try:
         video_path = await download_tiktok_video(message.text)
@@ -549,12 +837,13 @@ async def handle_tiktok_url(message: Message, state: FSMContext):
 
         await message.answer("Извлекаю первый кадр...")
 
-        frame_path = await extract_first_frame(video_path)
-        if not frame_path:
+        frame = await extract_first_frame(video_path)
+        if not frame:
             await message.answer("Не удалось извлечь кадр из видео.")
             return
 
-        resp = await process_image(frame_path)
+        resp = await process_image(frame)
+        hit = bool(resp and resp.raw)
         if resp:
             await state.update_data(yandex_response=resp)
             await send_result_page(message, resp)
@@ -565,10 +854,289 @@ async def handle_tiktok_url(message: Message, state: FSMContext):
         logger.error(f"Error processing TikTok: {e}")
         await message.answer(f"Ошибка: {str(e)}")
     finally:
+        activity.add_search(message.from_user.id, "tiktok", "yt-dlp+yandex", time.monotonic() - started, hit)
         if video_path and os.path.exists(video_path):
             os.remove(video_path)
-        if frame_path and os.path.exists(frame_path):
-            os.remove(frame_path)
+
+
+# Локальный кеш Shikimori для inline-режима, /anime и предзагрузки после поиска по картинке
+SHIKIMORI_CACHE_TTL = 6 * 60 * 60
+SHIKIMORI_CACHE_QUERIES = 2000
+SHIKIMORI_CACHE_ENTRIES = 5000
+SHIKIMORI_USER_CONCURRENCY = 4
+SHIKIMORI_FILL_CONCURRENCY = 2  # Фоновые поиски для inline-режима идут своей очередью
+SHIKIMORI_FILL_INTERVAL = 0.5
+SHIKIMORI_FILL_QUEUE = 50  # Сверх этого новые пользователи в inline-режиме получают только кеш
+SHIKIMORI_FILL_MIN_QUERY = 3  # Более короткие запросы ищем только в памяти
+SHIKIMORI_FILL_BACKOFF = 10  # После ошибки (обычно 429) inline-режим столько секунд не ходит в сеть
+SHIKIMORI_PREFETCH_CONCURRENCY = 2  # Сколько названий предзагрузка прогревает одновременно
+SHIKIMORI_PREFETCH_INTERVAL = 0.5  # Пауза между стартами фоновых запросов, чтобы Shikimori не отвечал 429
+SHIKIMORI_PREFETCH_PER_CHAT = 6  # Сверх этого новые названия от чата не прогреваются
+SHIKIMORI_PREFETCH_MAX_WAIT = 30  # Названия, прождавшие в очереди дольше, уже не нужны
+
+# Очередь, через которую идут запросы текущей задачи: "user" или фоновые "fill" и "prefetch"
+shikimori_lane = contextvars.ContextVar("shikimori_lane", default="user")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def poster_url_for(anime_data: dict, detailed_info: dict) -> str:
+    """Постер, который показывает /anime: полный из anime_info, иначе превью из поиска"""
+    return detailed_info.get('picture') if detailed_info else anime_data.get('poster')
+
+
+class RequestLane:
+    """Очередь запросов к Shikimori: не больше concurrency задач одновременно
+    и не чаще одного запроса в interval секунд"""
+
+    def __init__(self, concurrency: int, interval: float = 0.0):
+        self.interval = interval
+        self.slots = asyncio.Semaphore(concurrency)
+        self._next_start = 0.0
+
+    async def pace(self):
+        """Ждет момента старта запроса; моменты распределяются заранее, поэтому
+        одновременные задачи очереди не стартуют пачкой"""
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class ShikimoriCache:
+    """Кеш Shikimori: результаты поиска, anime_info и file_id отправленных постеров.
+
+    lookup() и get_*() работают только с памятью и никогда не ходят в сеть: промахи
+    заполняются в фоне через fill(). search() и anime_info() - сквозные
+    запросы; одинаковые одновременные запросы объединяются. Запросы к сети идут через
+    RequestLane своей очереди: пользовательские - через быструю, prefetch() - через
+    медленную с паузой между запросами, fill() - через свою, отдельную от /anime.
+    Пользователь не ждет фоновый запрос, который
+    еще стоит в очереди, но присоединяется к уже ушедшему в сеть."""
+
+    def __init__(self, ttl: float = SHIKIMORI_CACHE_TTL, max_queries: int = SHIKIMORI_CACHE_QUERIES,
+                 max_entries: int = SHIKIMORI_CACHE_ENTRIES, concurrency: int = SHIKIMORI_USER_CONCURRENCY):
+        self.ttl = ttl
+        self.max_queries = max_queries
+        self.max_entries = max_entries
+        self.concurrency = concurrency
+        self._searches = OrderedDict()  # запрос -> (время, результаты)
+        self._infos = OrderedDict()  # ссылка -> (время, anime_info)
+        self._file_ids = OrderedDict()  # url постера -> (время, file_id в Telegram)
+        self._entries = OrderedDict()  # ссылка -> (строка для поиска, результат)
+        self._pending = {}
+        self._queued = {}  # ключ фонового запроса, ждущего очереди -> перехвативший его пользовательский
+        self._prefetch_chats = Counter()  # чат -> названий в очереди предзагрузки
+        self._fills = {}  # пользователь -> задача фонового поиска для inline-режима
+        self._fill_queries = {}  # пользователь -> последний запрос, который еще не искали
+        self._fill_paused_until = 0.0
+        self._lanes = {
+            "user": RequestLane(concurrency),
+            "fill": RequestLane(SHIKIMORI_FILL_CONCURRENCY, SHIKIMORI_FILL_INTERVAL),
+            "prefetch": RequestLane(SHIKIMORI_PREFETCH_CONCURRENCY, SHIKIMORI_PREFETCH_INTERVAL),
+        }
+
+    def _get(self, store: OrderedDict, key: str):
+        cached = store.get(key)
+        if cached is None:
+            return None
+        if time.monotonic() - cached[0] > self.ttl:
+            del store[key]
+            return None
+        store.move_to_end(key)
+        return cached[1]
+
+    def _put(self, store: OrderedDict, key: str, value, limit: int):
+        store[key] = (time.monotonic(), value)
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    def _once(self, key: tuple, factory):
+        """Запускает factory() один раз на ключ, пока предыдущий запрос не завершился.
+
+        Пользовательский запрос присоединяется к фоновому с тем же ключом. Если фоновый
+        еще ждет своей очереди, пользовательский запускается сразу, а фоновый потом
+        вернет его результат (см. _limited)."""
+        task = self._pending.get(key)
+        promote = task is not None and shikimori_lane.get() == "user" and key in self._queued \
+            and self._queued[key] is None
+        if task is None or promote:
+            task = asyncio.ensure_future(factory())
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._pending.pop(key) if self._pending.get(key) is done else None)
+            if promote:
+                self._queued[key] = task
+        return asyncio.shield(task)
+
+    async def _limited(self, key: tuple, func, *args):
+        """Вызывает сетевую корутину func(*args) через очередь текущей задачи"""
+        lane = self._lanes[shikimori_lane.get()]
+        if shikimori_lane.get() == "user":
+            async with lane.slots:
+                return await func(*args)
+
+        # Слот фоновой очереди задача уже держит (см. _fill и _prefetch), здесь только пауза
+        self._queued[key] = None
+        try:
+            await lane.pace()
+        finally:
+            promoted = self._queued.pop(key, None)
+        if promoted is not None:
+            return await asyncio.shield(promoted)
+        return await func(*args)
+
+    def get_search(self, query: str):
+        return self._get(self._searches, normalize_query(query))
+
+    def put_search(self, query: str, results: list):
+        self._put(self._searches, normalize_query(query), results, self.max_queries)
+        for result in results:
+            haystack = normalize_query(f"{result.get('title') or ''} {result.get('original_title') or ''}")
+            self._entries[result['link']] = (haystack, result)
+            self._entries.move_to_end(result['link'])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_info(self, link: str):
+        return self._get(self._infos, link)
+
+    def get_file_id(self, url: str):
+        return self._get(self._file_ids, url) if url else None
+
+    def put_file_id(self, url: str, file_id: str):
+        self._put(self._file_ids, url, file_id, self.max_entries)
+
+    def lookup(self, query: str, limit: int = 20) -> list:
+        """Результаты из памяти: точное совпадение запроса или подстрока в названиях"""
+        results = self.get_search(query)
+        if results is not None:
+            return results[:limit]
+
+        key = normalize_query(query)
+        matches = []
+        for haystack, result in reversed(self._entries.values()):
+            if key in haystack:
+                matches.append(result)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    async def search(self, query: str) -> list:
+        results = self.get_search(query)
+        if results is not None:
+            return results
+
+        key = ("search", normalize_query(query))
+
+        async def fetch():
+            found = await self._limited(key, get_parser().search, query) or []
+            self.put_search(query, found)
+            return found
+
+        return await self._once(key, fetch)
+
+    async def anime_info(self, link: str) -> dict:
+        info = self.get_info(link)
+        if info is not None:
+            return info
+
+        key = ("info", link)
+
+        async def fetch():
+            found = await self._limited(key, get_parser().anime_info, link)
+            if found:
+                self._put(self._infos, link, found, self.max_queries)
+            return found
+
+        return await self._once(key, fetch)
+
+    async def resolve(self, title: str):
+        """Название -> (первый результат поиска, anime_info).
+
+        Постер сами не скачиваем: Telegram забирает его по ссылке, а повторные ответы
+        отправляют file_id, так что параллельно с anime_info загружать нечего."""
+        results = await self.search(title)
+        if not results:
+            return None, None
+        return results[0], await self.anime_info(results[0]['link'])
+
+    def fill(self, query: str, user_id: int) -> bool:
+        """Поиск в фоне по промаху кеша (inline-режим). Возвращает False, если поиска не будет.
+
+        У пользователя не больше одного ожидающего поиска: новый запрос заменяет
+        еще не начатый, ведь Telegram покажет ответ только на последний."""
+        if len(normalize_query(query)) < SHIKIMORI_FILL_MIN_QUERY or time.monotonic() < self._fill_paused_until:
+            return False
+        if user_id not in self._fills and len(self._fills) >= SHIKIMORI_FILL_QUEUE:
+            return False
+
+        self._fill_queries[user_id] = query
+        if user_id not in self._fills:
+            token = shikimori_lane.set("fill")
+            try:
+                self._fills[user_id] = asyncio.ensure_future(self._fill(user_id))
+            finally:
+                shikimori_lane.reset(token)
+        return True
+
+    async def _fill(self, user_id: int):
+        try:
+            while user_id in self._fill_queries:
+                async with self._lanes["fill"].slots:
+                    query = self._fill_queries.pop(user_id, None)
+                    if query is None or self.get_search(query) is not None:
+                        continue
+                    try:
+                        await self.search(query)
+                    except Exception as e:
+                        logger.error(f"Shikimori fill error for '{query}': {e}")
+                        self._fill_paused_until = time.monotonic() + SHIKIMORI_FILL_BACKOFF
+        finally:
+            self._fills.pop(user_id, None)
+            self._fill_queries.pop(user_id, None)
+
+    def prefetch(self, title: str, chat_id: int):
+        """Спекулятивно прогревает поиск и anime_info первого результата.
+
+        Очередь берет название целиком (search, затем anime_info) и только потом
+        следующее; от одного чата в ней не больше SHIKIMORI_PREFETCH_PER_CHAT названий."""
+        key = normalize_query(title)
+        if not key or ("prefetch", key) in self._pending:
+            return
+
+        results = self.get_search(title)
+        if results is not None and (not results or self.get_info(results[0]['link']) is not None):
+            return
+
+        if self._prefetch_chats[chat_id] >= SHIKIMORI_PREFETCH_PER_CHAT:
+            return
+        self._prefetch_chats[chat_id] += 1
+
+        token = shikimori_lane.set("prefetch")
+        try:
+            self._once(("prefetch", key), lambda: self._prefetch(title, chat_id))
+        finally:
+            shikimori_lane.reset(token)
+
+    async def _prefetch(self, title: str, chat_id: int):
+        queued = time.monotonic()
+        try:
+            async with self._lanes["prefetch"].slots:
+                if time.monotonic() - queued < SHIKIMORI_PREFETCH_MAX_WAIT:
+                    await self.resolve(title)
+        except Exception as e:
+            logger.error(f"Shikimori prefetch error for '{title}': {e}")
+        finally:
+            self._prefetch_chats[chat_id] -= 1
+            if self._prefetch_chats[chat_id] <= 0:
+                del self._prefetch_chats[chat_id]
+
+
+shikimori = ShikimoriCache()
 
 
 @dp.message(Command("anime"))
@@ -576,7 +1144,7 @@ async def cmd_anime_search(message: Message, state: FSMContext):
     """Поиск информации об аниме на Shikimori"""
     args = message.text.split(maxsplit=1)
     if len(args) > 1:
-        await search_anime_info(message, args[1])
+        await search_anime_info(message, args[1], state)
     else:
         builder = InlineKeyboardBuilder()
         builder.button(
@@ -629,18 +1197,21 @@ async def process_anime_name(message: Message, state: FSMContext):
     await search_anime_info(message, message.text, state)
 
 
-async def search_anime_info(message: Message, anime_name: str, state: FSMContext):
-    """Ищет информацию об аниме на Shikimori"""
+async def search_anime_info(message: Message, anime_name: str, state: FSMContext, user_id: int = None):
+    """Ищет информацию об аниме на Shikimori (через кеш, см. ShikimoriCache)"""
     await message.answer(f"🔍 Ищу информацию об аниме '{anime_name}'...")
 
+    started = time.monotonic()
+    hit = False
     try:
-        search_results = await parser.search(anime_name)
+        search_results = await shikimori.search(anime_name)
+        hit = bool(search_results)
         if not search_results:
             await message.answer(f"❌ Аниме '{anime_name}' не найдено.")
             return
 
         anime_data = search_results[0]
-        detailed_info = await parser.anime_info(anime_data['link'])
+        detailed_info = await shikimori.anime_info(anime_data['link'])
 
         message_parts = [
             f"🎬 <b>Название:</b> {anime_data['title']}",
@@ -671,16 +1242,19 @@ async def search_anime_info(message: Message, anime_name: str, state: FSMContext
 
         message_parts.append(f"\n🔗 <a href='{anime_data['link']}'>Подробнее на Shikimori</a>")
 
-        poster_url = detailed_info.get('picture') if detailed_info else anime_data.get('poster')
+        poster_url = poster_url_for(anime_data, detailed_info)
         if poster_url:
+            # Первый раз Telegram скачивает постер по ссылке сам, дальше отправляем его file_id
             try:
-                await message.answer_photo(
-                    photo=poster_url,
+                sent = await message.answer_photo(
+                    photo=shikimori.get_file_id(poster_url) or poster_url,
                     caption="\n".join(message_parts)
                 )
             except Exception as e:
                 logger.error(f"Не удалось отправить постер: {e}")
                 await message.answer("\n".join(message_parts))
+            else:
+                shikimori.put_file_id(poster_url, sent.photo[-1].file_id)
         else:
             await message.answer("\n".join(message_parts))
 
@@ -694,6 +1268,7 @@ async def search_anime_info(message: Message, anime_name: str, state: FSMContext
         logger.error(f"Error searching anime: {e}")
         await message.answer(f"Произошла ошибка при поиске аниме: {e}")
     finally:
+        activity.add_search(user_id or message.from_user.id, "anime", "shikimori", time.monotonic() - started, hit)
         current_state = await state.get_state()
         if current_state == AnimeSearchStates.waiting_for_anime_name:
             await state.set_state(None)
@@ -705,6 +1280,90 @@ async def search_anime_info(message: Message, anime_name: str, state: FSMContext
 
 
 
+INLINE_DEBOUNCE = 0.3
+INLINE_CACHE_TIME = 300
+inline_latest = {}  # user_id -> id последнего inline-запроса
+
+
+def format_inline_result(anime_data: dict) -> InlineQueryResultArticle:
+    details = [anime_data.get(key) for key in ("type", "year", "status")]
+    description = " · ".join(str(detail) for detail in details if detail)
+    if anime_data.get('genres'):
+        description += "\n" + ", ".join(anime_data['genres'][:4])
+
+    message_parts = [
+        f"🎬 <b>Название:</b> {html.escape(anime_data['title'])}",
+        f"🔹 <b>Оригинальное название:</b> {html.escape(anime_data.get('original_title') or '')}",
+    ]
+    if anime_data.get('type'):
+        message_parts.append(f"📺 <b>Тип:</b> {anime_data['type']}")
+    if anime_data.get('year'):
+        message_parts.append(f"📅 <b>Год:</b> {anime_data['year']}")
+    if anime_data.get('status'):
+        message_parts.append(f"🔄 <b>Статус:</b> {anime_data['status']}")
+    if anime_data.get('genres'):
+        message_parts.append(f"🏷️ <b>Жанры:</b> {', '.join(anime_data['genres'])}")
+    message_parts.append(f"\n🔗 <a href='{anime_data['link']}'>Подробнее на Shikimori</a>")
+
+    return InlineQueryResultArticle(
+        id=str(anime_data.get('shikimori_id') or uuid.uuid5(uuid.NAMESPACE_URL, anime_data['link']).hex),
+        title=anime_data['title'],
+        description=description or None,
+        thumbnail_url=anime_data.get('poster'),
+        url=anime_data['link'],
+        input_message_content=InputTextMessageContent(message_text="\n".join(message_parts), parse_mode=ParseMode.HTML)
+    )
+
+
+@dp.inline_query()
+async def handle_inline_query(inline_query: InlineQuery):
+    """Отвечает на @bot <название> из локального кеша, промахи дозаполняются в фоне"""
+    user_id = inline_query.from_user.id
+    inline_latest[user_id] = inline_query.id
+    await asyncio.sleep(INLINE_DEBOUNCE)
+    if inline_latest.get(user_id) != inline_query.id:
+        return  # пользователь продолжил печатать, этот запрос Telegram уже не покажет
+    del inline_latest[user_id]
+
+    query = inline_query.query.strip()
+    if not query or query == SHARE_QUERY.strip():
+        me = await inline_query.bot.me()
+        await inline_query.answer(
+            [InlineQueryResultArticle(
+                id="share",
+                title=BOT_NAME,
+                description="Поиск аниме по скриншоту или ссылке на TikTok/Shorts",
+                input_message_content=InputTextMessageContent(
+                    message_text=f"{BOT_NAME}{SHARE_QUERY}: @{me.username}"
+                )
+            )],
+            cache_time=INLINE_CACHE_TIME
+        )
+        return
+
+    results = shikimori.lookup(query, limit=20)
+    exact = shikimori.get_search(query) is not None
+    searching = not exact and shikimori.fill(query, user_id)
+
+    button = None
+    if not results:
+        # Завершившийся пустой поиск - это «не найдено», а не «ищу»
+        if searching:
+            text = "🔍 Ищу... продолжите ввод или откройте бота"
+        elif exact:
+            text = "❌ Ничего не найдено, откройте бота"
+        else:
+            text = "✏️ Продолжите ввод названия или откройте бота"
+        button = InlineQueryResultsButton(text=text, start_parameter="inline")
+
+    await inline_query.answer(
+        [format_inline_result(anime_data) for anime_data in results],
+        # Неполный ответ не кешируем, чтобы после фонового поиска показать точные результаты
+        cache_time=INLINE_CACHE_TIME if exact else 1,
+        button=button
+    )
+
+
 @dp.callback_query(F.data == "contact_admin")
 async def contact_admin_callback(callback: CallbackQuery, state: FSMContext):
     builder = InlineKeyboardBuilder()
@@ -729,18 +1388,18 @@ async def process_contact_message(message: Message, state: FSMContext):
     if message.text:
         text += message.text
         text += "\n\nИспользуй /answer userid текст - для ответа"
-        await bot.send_message(admin_id, text)
+        await message.bot.send_message(admin_id, text)
     elif message.photo:
         photo = message.photo[-1]
         file_id = photo.file_id
-        file = await bot.get_file(file_id)
+        file = await message.bot.get_file(file_id)
         file_path = file.file_path
 
         temp_image_path = f"temp/contact_{uuid.uuid4()}.jpg"
-        await bot.download_file(file_path, temp_image_path)
+        await message.bot.download_file(file_path, temp_image_path)
 
         with open(temp_image_path, "rb") as photo_file:
-            await bot.send_photo(
+            await message.bot.send_photo(
                 admin_id,
                 BufferedInputFile(photo_file.read(), filename="contact.jpg"),
                 caption=text + (f"\n\n{message.caption}" if message.caption else "\n[без текста]") +
@@ -800,7 +1459,7 @@ async def send_to_all_users(message: Message):
             user_id = user[0]
             try:
                 await asyncio.sleep(1)
-                await bot.send_message(user_id, sendtext)
+                await message.bot.send_message(user_id, sendtext)
                 success += 1
             except (TelegramForbiddenError, TelegramBadRequest) as e:
                 failed += 1
@@ -830,8 +1489,248 @@ async def send_to_all_users(message: Message):
         await message.answer(f"Ошибка при рассылке: {str(e)}")
 
 
+# Профилирование и контроль задержек event loop
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD_MS", 250)) / 1000  # 0 - отключить
+PROFILE_MAX_SECONDS = 120
+PROFILE_INTERVAL = 0.005
+
+
+class LoopWatchdog:
+    """Фоновый поток, который логирует стек event loop, если тот занят дольше threshold.
+
+    Корутина-пульс обновляет метку времени каждые interval секунд, поток сверяет ее
+    с текущим временем. Пока loop не завис, накладные расходы - один sleep на интервал."""
+
+    def __init__(self, threshold: float, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self.max_stall = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._heartbeat_task = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.threshold <= 0 or self._thread is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported = False
+        while not self._stopped.wait(self.interval):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled <= self.threshold:
+                reported = False
+                continue
+
+            self.max_stall = max(self.max_stall, stalled)
+            if reported:
+                continue
+
+            reported = True
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<нет стека>"
+            logger.error(f"Event loop blocked for {stalled * 1000:.0f} ms:\n{stack}")
+
+
+watchdog = LoopWatchdog(LOOP_LAG_THRESHOLD)
+profiling = False
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float = PROFILE_INTERVAL) -> Counter:
+    """Семплирует стек потока thread_id (потока event loop) и считает одинаковые стеки.
+
+    Простаивающие воркеры to_thread и другие потоки не учитываются, чтобы в отчете
+    было видно именно то, что занимает loop."""
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stacks[tuple(reversed(stack))] += 1
+        time.sleep(interval)
+
+    return stacks
+
+
+IDLE_FRAMES = ("select (selectors.py:", "select (windows_events.py:")
+
+
+def is_idle(stack: tuple) -> bool:
+    """Loop ждет событий в selector - это простой, а не работа"""
+    return stack[-1].startswith(IDLE_FRAMES)
+
+
+def shared_prefix(stacks) -> int:
+    """Сколько кадров от корня одинаковы во всех стеках (asyncio.run, run_forever, _run_once...)"""
+    stacks = list(stacks)
+    if not stacks:
+        return 0
+    length = min(len(stack) for stack in stacks) - 1  # лист оставляем всегда
+    for i in range(length):
+        if any(stack[i] != stacks[0][i] for stack in stacks):
+            return i
+    return length
+
+
+def format_profile(stacks: Counter, top: int = 15) -> str:
+    """Топ функций по собственному и суммарному времени.
+
+    Семплы простоя (loop ждет в select) идут одной строкой, а кадры, общие для
+    всех остальных стеков, не ранжируются - иначе отчет занимают select и обвязка asyncio.
+    Проценты считаются от всех семплов, то есть это доля времени работы loop."""
+    total = sum(stacks.values()) or 1
+    busy = {stack: count for stack, count in stacks.items() if not is_idle(stack)}
+    idle = sum(stacks.values()) - sum(busy.values())
+    skip = shared_prefix(busy)
+
+    own = Counter()
+    cumulative = Counter()
+    for stack, count in busy.items():
+        own[stack[-1]] += count
+        for function in set(stack[skip:]):
+            cumulative[function] += count
+
+    lines = [f"Семплов: {total}", f"Простой (ожидание событий): {idle * 100 / total:.1f}%"]
+    if skip:
+        lines.append(f"Общих кадров у всех стеков (не показаны): {skip}, последний - {next(iter(busy))[skip - 1]}")
+    lines += ["", "Собственное время:"]
+    lines += [f"{count * 100 / total:5.1f}%  {function}" for function, count in own.most_common(top)]
+    lines += ["", "Суммарное время:"]
+    lines += [f"{count * 100 / total:5.1f}%  {function}" for function, count in cumulative.most_common(top)]
+    return "\n".join(lines)
+
+
+def collapse_stacks(stacks: Counter) -> str:
+    """Стеки в формате collapsed (flamegraph.pl, speedscope)"""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common())
+
+
+@dp.message(Command("profile"))
+async def cmd_profile(message: Message, command: CommandObject):
+    """Запускает семплирующий профайлер на N секунд и присылает отчет админу"""
+    if str(message.from_user.id) != ADMIN_ID:
+        return
+
+    try:
+        seconds = float(command.args) if command.args else 10
+    except ValueError:
+        await message.answer("Используйте: /profile [секунды]")
+        return
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+
+    global profiling
+    if profiling:
+        await message.answer("Профилирование уже запущено")
+        return
+
+    profiling = True
+    try:
+        await message.answer(f"Профилирую {seconds:g} с...")
+        stacks = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds)
+    finally:
+        profiling = False
+
+    report = format_profile(stacks)
+    report += (
+        f"\n\nЗависаний event loop > {LOOP_LAG_THRESHOLD * 1000:.0f} мс: {watchdog.stalls}, "
+        f"максимум {watchdog.max_stall * 1000:.0f} мс"
+    )
+    await message.answer_document(
+        BufferedInputFile(collapse_stacks(stacks).encode(), filename=f"profile_{int(time.time())}.txt"),
+        caption="Стеки в формате collapsed: flamegraph.pl или speedscope.app"
+    )
+    await message.answer(f"<pre>{html.escape(report[:4000])}</pre>")
+
+
+background_tasks = set()
+first_update_seen = False
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def check_db():
+    try:
+        await init_db()
+        mark_startup("db schema checked")
+    except Exception as e:
+        logger.error(f"DB init error: {e}")
+
+
+async def prewarm_in_background():
+    try:
+        await asyncio.to_thread(prewarm)
+        mark_startup("heavy modules loaded")
+    except Exception as e:
+        logger.error(f"Prewarm error: {e}")
+
+
+@dp.update.outer_middleware()
+async def track_first_update(handler, event, data):
+    global first_update_seen
+    if not first_update_seen:
+        first_update_seen = True
+        mark_startup("first update received")
+    return await handler(event, data)
+
+
+@dp.startup()
+async def on_startup():
+    activity.start()
+    watchdog.start()
+    run_in_background(prewarm_in_background())
+    mark_startup("dispatcher started, polling begins")
+
+
+@dp.shutdown()
+async def on_shutdown():
+    await watchdog.stop()
+    await activity.stop()
+
+
 async def main():
-    await init_db()
+    mark_startup("modules imported")
+    # Схема проверяется параллельно со стартом поллинга, запись в БД и так идет через буфер
+    run_in_background(check_db())
+    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
     await dp.start_polling(bot)
 
 
@@ -839,4 +1738,4 @@ if __name__ == "__main__":
     if not os.path.exists("temp"):
         os.makedirs("temp")
 
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""Общие утилиты для бенчмарков и нагрузочных тестов"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# anime.py читает токен при импорте, для офлайн-запуска хватает фиктивного
+os.environ.setdefault("ANIME_BOT", "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ.setdefault("ADMIN_ID", "1")
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples) -> dict:
+    """Сводка по замерам в секундах: среднее, медиана, перцентили, операций в секунду"""
+    total = sum(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000 if samples else 0.0,
+        "median_ms": statistics.median(samples) * 1000 if samples else 0.0,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "min_ms": min(samples) * 1000 if samples else 0.0,
+        "ops_per_sec": len(samples) / total if total else 0.0,
+    }
+
+
+def measure(func, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+async def measure_async(func, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        await func()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS текущего процесса в мегабайтах"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS ru_maxrss в байтах, на Linux - в килобайтах
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float:
+    """Текущий RSS в мегабайтах (на системах без /proc - пиковый)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def write_report(path: str, results: dict):
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
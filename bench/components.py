@@ -0,0 +1,130 @@
+"""Микробенчмарки горячих путей бота. Работает офлайн: сеть и MySQL заменены заглушками.
+
+Запуск:
+    python -m bench.components [--repeat 200] [--report bench_components.json]
+    python -m bench.components --baseline old.json   # код 1, если медиана выросла больше --threshold
+    python -m bench.components --mysql-db anime_bench  # upsert в настоящую MySQL (DB_* из .env)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+
+from bench.common import measure, measure_async, write_report
+from bench.fakes import FakeMessage, FakeShikimori, Latency, fake_create_pool, fake_yandex_response
+from bench.frames import sample_clips
+
+import anime
+import numpy as np
+
+
+def bench_frames(clips: list, repeat: int) -> dict:
+    results = {}
+    for clip in clips:
+        name = os.path.splitext(os.path.basename(clip))[0]
+        results[f"extract_frame[{name}]"] = measure(lambda: anime._extract_frame(clip, 10), repeat)
+    return results
+
+
+def bench_preprocessing(repeat: int) -> dict:
+    frame = np.zeros((1920, 1080, 3), dtype=np.uint8)
+    frame[..., 1] = np.linspace(0, 255, 1080, dtype=np.uint8)
+    return {
+        "frame_is_blank[1080x1920]": measure(lambda: anime._frame_is_blank(frame), repeat),
+        "encode_frame[1080x1920]": measure(lambda: anime._encode_frame(frame), repeat),
+    }
+
+
+def bench_rendering(repeat: int) -> dict:
+    # Предзагрузка Shikimori из send_result_page уходит в заглушку без задержки
+    rng = random.Random(0)
+    anime.parser = FakeShikimori(Latency(0, 0, rng), hit_rate=1.0, rng=rng)
+
+    resp = fake_yandex_response(results=30)
+    text_only = fake_yandex_response(results=30, thumbnails=False)
+    titles = [result.title for result in resp.raw if result.title]
+    message = FakeMessage()
+
+    async def send_page():
+        await anime.send_result_page(message, text_only, page=2, edit_message_id=1)
+
+    return {
+        "clean_title": measure(lambda: [anime.clean_title(title) for title in titles], repeat),
+        "render_result_page": measure(lambda: anime.render_result_page(resp, 2, 3), repeat),
+        "send_result_page[edit]": asyncio.run(measure_async(send_page, repeat)),
+        "create_pagination_keyboard": measure(
+            lambda: anime.create_pagination_keyboard(resp.url, 2, 10), repeat
+        ),
+    }
+
+
+def bench_upsert(repeat: int, mysql_db: str = None) -> dict:
+    if mysql_db:
+        anime.DB_CONFIG["db"] = mysql_db
+        asyncio.run(anime.init_db())
+    else:
+        anime.create_pool = fake_create_pool()
+
+    async def flush_batch(users: int, searches: int):
+        buffer = anime.ActivityBuffer()
+        for i in range(users):
+            buffer.add_user(10 ** 12 + i, f"user{i}", "Bench", None)
+        for i in range(searches):
+            buffer.add_search(10 ** 12 + i, "photo", "yandex", 1.5, i % 2 == 0)
+        await buffer.flush()
+
+    results = {}
+    for size in (1, 100, 500):
+        results[f"activity_flush[{size}]"] = asyncio.run(
+            measure_async(lambda: flush_batch(size, size), max(1, repeat // 10))
+        )
+    return results
+
+
+def compare(report: dict, baseline_path: str, threshold: float) -> list:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    for name, stats in report.items():
+        old = baseline.get(name)
+        if old and old["median_ms"] > 0 and stats["median_ms"] > old["median_ms"] * (1 + threshold):
+            regressions.append(f"{name}: {old['median_ms']:.3f} -> {stats['median_ms']:.3f} ms")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    arg_parser.add_argument("--report", default="bench_components.json")
+    arg_parser.add_argument("--baseline", help="отчет предыдущего запуска для сравнения")
+    arg_parser.add_argument("--threshold", type=float, default=0.2, help="допустимый рост медианы (доля)")
+    arg_parser.add_argument("--mysql-db", help="база для upsert-бенчмарка (по умолчанию - заглушка)")
+    args = arg_parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        results.update(bench_frames(sample_clips(directory), max(1, args.repeat // 10)))
+    results.update(bench_preprocessing(args.repeat))
+    results.update(bench_rendering(args.repeat))
+    results.update(bench_upsert(args.repeat, args.mysql_db))
+
+    for name, stats in results.items():
+        print(f"{name:40} median {stats['median_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms  {stats['ops_per_sec']:10.1f} op/s")
+
+    write_report(args.report, results)
+    print(f"Отчет: {args.report}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        for line in regressions:
+            print(f"Регрессия: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
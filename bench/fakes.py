@@ -0,0 +1,154 @@
+"""Локальные заглушки внешних сервисов для бенчмарков и нагрузочных тестов"""
+import asyncio
+import math
+import random
+from types import SimpleNamespace
+
+FAKE_SEARCH_URL = "https://yandex.ru/images/search?rpt=imageview&cbir_id=bench"
+
+TITLES = [
+    "Sousou no Frieren – 1 серия смотреть онлайн",
+    "Провожающая в последний путь Фрирен - Аниме",
+    "Chainsaw Man — Episode 12",
+    "Kimetsu no Yaiba - Demon Slayer wallpaper",
+    "Jujutsu Kaisen",
+    "Атака титанов — Shingeki no Kyojin - скриншот",
+    "",
+]
+
+
+class Latency:
+    """Логнормальная задержка с заданной медианой (мс) и разбросом sigma"""
+
+    def __init__(self, median_ms: float, sigma: float, rng: random.Random):
+        self.mu = math.log(max(median_ms, 0.001) / 1000)
+        self.sigma = sigma
+        self.rng = rng
+
+    async def wait(self):
+        await asyncio.sleep(self.rng.lognormvariate(self.mu, self.sigma))
+
+
+def fake_anime(title: str) -> dict:
+    """Результат поиска Shikimori с теми полями, которые использует бот"""
+    slug = abs(hash(title)) % 100000
+    return {
+        "title": title,
+        "original_title": title,
+        "link": f"https://shikimori.one/animes/{slug}",
+        "poster": f"https://shikimori.one/posters/{slug}.jpg",
+    }
+
+
+class FakeShikimori:
+    """Замена ShikimoriParserAsync с поиском и anime_info, запоминает запросы в calls"""
+
+    def __init__(self, latency: Latency, hit_rate: float, rng: random.Random):
+        self.latency = latency
+        self.hit_rate = hit_rate
+        self.rng = rng
+        self.calls = []
+
+    async def search(self, title: str):
+        self.calls.append(("search", title))
+        await self.latency.wait()
+        if self.rng.random() > self.hit_rate:
+            return []
+        return [fake_anime(title)]
+
+    async def anime_info(self, link: str):
+        self.calls.append(("info", link))
+        await self.latency.wait()
+        return {
+            "type": "TV Сериал",
+            "episodes": "12",
+            "status": "вышло",
+            "genres": ["Приключения", "Фэнтези"],
+            "score": "8.9",
+            "picture": link + ".jpg",
+            "description": "Описание " * 50,
+        }
+
+
+def fake_yandex_response(results: int = 12, thumbnails: bool = True, seed: int = 0):
+    """Ответ Яндекса с теми полями, которые использует бот"""
+    rng = random.Random(seed)
+    raw = [
+        SimpleNamespace(
+            title=rng.choice(TITLES),
+            url=f"https://example.com/result/{i}",
+            thumbnail=f"https://example.com/thumb/{i}.jpg" if thumbnails else None,
+        )
+        for i in range(results)
+    ]
+    return SimpleNamespace(raw=raw, url=FAKE_SEARCH_URL)
+
+
+class FakeMessage:
+    """Минимальная замена aiogram Message: запоминает вызовы вместо запросов к Telegram"""
+
+    def __init__(self, chat_id: int = 1):
+        self.chat = SimpleNamespace(id=chat_id)
+        self.calls = 0
+        self._next_id = 100
+        self.bot = SimpleNamespace(
+            edit_message_text=self._record,
+            edit_message_media=self._record,
+        )
+
+    async def _record(self, *args, **kwargs):
+        self.calls += 1
+        self._next_id += 1
+        return SimpleNamespace(message_id=self._next_id)
+
+    async def answer_photo(self, photo, **kwargs):
+        sent = await self._record(photo, **kwargs)
+        sent.photo = [SimpleNamespace(file_id=f"photo{sent.message_id}")]
+        return sent
+
+    answer = _record
+    answer_media_group = _record
+
+
+class FakeCursor:
+    def __init__(self, latency: float, statements: list):
+        self.latency = latency
+        self.statements = statements
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, query, args=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.statements.append((query, args))
+
+    async def fetchall(self):
+        return []
+
+
+class FakeConnection(FakeCursor):
+    def cursor(self):
+        return FakeCursor(self.latency, self.statements)
+
+    async def commit(self):
+        pass
+
+
+class FakePool(FakeCursor):
+    """Замена aiomysql pool: каждый запрос выполняется за latency секунд"""
+
+    def acquire(self):
+        return FakeConnection(self.latency, self.statements)
+
+
+def fake_create_pool(latency: float = 0.0, statements: list = None):
+    statements = statements if statements is not None else []
+
+    async def create_pool():
+        return FakePool(latency, statements)
+
+    return create_pool
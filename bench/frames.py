@@ -0,0 +1,130 @@
+"""Сравнение извлечения кадра: старый последовательный cap.read() против seek-движка.
+
+Запуск:
+    python -m bench.frames [clip.mp4 ...] [--repeat 20] [--report frames.json]
+
+Без аргументов генерирует синтетические ролики с черной заставкой в начале.
+Память меряется в отдельном процессе на каждый подход (пиковый RSS).
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import uuid
+
+from bench.common import measure, peak_rss_mb, write_report
+
+import cv2
+import numpy as np
+
+
+def legacy_extract(video_path: str, max_attempts: int = 10) -> bytes:
+    """Прежняя реализация extract_first_frame: полное декодирование и запись JPEG на диск"""
+    cap = cv2.VideoCapture(video_path)
+    for _ in range(max_attempts):
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        if cv2.mean(frame)[0] > 10:
+            image_path = os.path.join(tempfile.gettempdir(), f"frame_{uuid.uuid4()}.jpg")
+            cv2.imwrite(image_path, frame)
+            cap.release()
+            with open(image_path, "rb") as f:
+                data = f.read()
+            os.remove(image_path)
+            return data
+
+    cap.release()
+    return None
+
+
+def seek_extract(video_path: str, max_attempts: int = 10) -> bytes:
+    import anime
+
+    return anime._extract_frame(video_path, max_attempts)
+
+
+APPROACHES = {
+    "legacy": legacy_extract,
+    "seek": seek_extract,
+}
+
+
+def make_clip(path: str, width: int, height: int, seconds: float, black_seconds: float, fps: int = 30):
+    """Создает ролик: black_seconds черного экрана, затем градиент с движущимся прямоугольником"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    black = np.zeros((height, width, 3), dtype=np.uint8)
+    gradient = np.zeros((height, width, 3), dtype=np.uint8)
+    gradient[..., 1] = np.linspace(0, 255, width, dtype=np.uint8)
+    gradient[..., 2] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    for i in range(int(seconds * fps)):
+        if i < black_seconds * fps:
+            writer.write(black)
+            continue
+
+        frame = gradient.copy()
+        x = (i * 8) % (width - width // 4)
+        cv2.rectangle(frame, (x, height // 3), (x + width // 4, height // 2), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def sample_clips(directory: str) -> list:
+    clips = []
+    for width, height, black_seconds in ((720, 1280, 0), (1080, 1920, 0.2), (1080, 1920, 1.0)):
+        path = os.path.join(directory, f"clip_{width}x{height}_{black_seconds}s.mp4")
+        make_clip(path, width, height, seconds=3, black_seconds=black_seconds)
+        clips.append(path)
+    return clips
+
+
+def _run_approach(name: str, clips: list, repeat: int, queue):
+    # anime импортируется в обоих процессах, чтобы сравнивать только прирост памяти
+    import anime  # noqa: F401
+
+    func = APPROACHES[name]
+    baseline_rss = peak_rss_mb()
+    results = {}
+    for clip in clips:
+        frame = func(clip)
+        stats = measure(lambda: func(clip), repeat)
+        stats["frame_bytes"] = len(frame) if frame else 0
+        results[os.path.basename(clip)] = stats
+    queue.put({"clips": results, "peak_rss_mb": peak_rss_mb(), "rss_growth_mb": peak_rss_mb() - baseline_rss})
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("clips", nargs="*", help="пути к роликам (по умолчанию - синтетические)")
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    arg_parser.add_argument("--report", default="bench_frames.json")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        clips = args.clips or sample_clips(directory)
+
+        # spawn, чтобы пиковый RSS одного подхода не влиял на другой
+        context = multiprocessing.get_context("spawn")
+        results = {}
+        for name in APPROACHES:
+            queue = context.Queue()
+            process = context.Process(target=_run_approach, args=(name, clips, args.repeat, queue))
+            process.start()
+            results[name] = queue.get()
+            process.join()
+
+    for name, result in results.items():
+        print(f"{name}: peak RSS {result['peak_rss_mb']:.1f} MB (+{result['rss_growth_mb']:.1f} MB за прогон всех роликов)")
+        for clip, stats in result["clips"].items():
+            print(
+                f"  {clip}: {stats['ops_per_sec']:.1f} извлечений/с, "
+                f"median {stats['median_ms']:.1f} ms, JPEG {stats['frame_bytes'] // 1024} KB"
+            )
+
+    write_report(args.report, results)
+    print(f"Отчет: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Нагрузочный прогон: синтетические апдейты Telegram подаются в dp.feed_update.
+
+Telegram, Яндекс, Shikimori и yt-dlp заменены локальными заглушками с
+логнормальной задержкой (медиана и разброс задаются флагами). Апдейты приходят
+пуассоновским потоком с заданной интенсивностью.
+
+Запуск:
+    python -m bench.load --rate 20 --duration 60 --users 500
+    python -m bench.load --mix photo=4,tiktok=1,shorts=1,anime=2,page=3,info=2 --yandex-ms 1500
+
+Отчет: пропускная способность, перцентили задержки по типам апдейтов,
+задержка event loop и прирост памяти.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+
+from bench.common import current_rss_mb, percentile, peak_rss_mb, write_report
+from bench.fakes import FAKE_SEARCH_URL, FakeShikimori, Latency, fake_yandex_response
+from bench.frames import make_clip
+
+import anime
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.methods import GetFile, SendMediaGroup, SendPhoto
+from aiogram.types import File, Message, Update
+
+# Минимальный валидный JPEG, который отдает «Telegram» при скачивании фото
+FAKE_JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f"
+    "141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b08000100010101"
+    "1100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffda0008010100003f00d2cf20ffd9"
+)
+
+
+class FakeTelegramSession(BaseSession):
+    """Сессия aiogram, которая отвечает на методы Bot API локально"""
+
+    def __init__(self, latency: Latency):
+        super().__init__()
+        self.latency = latency
+        self.requests = 0
+        self._message_ids = itertools.count(1000)
+
+    async def close(self):
+        pass
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests += 1
+        await self.latency.wait()
+
+        if isinstance(method, GetFile):
+            return File(file_id=method.file_id, file_unique_id=method.file_id, file_path=f"photos/{method.file_id}.jpg")
+        if isinstance(method, SendMediaGroup):
+            return [self._message(bot, method.chat_id) for _ in method.media]
+        if method.__returning__ is bool:
+            return True
+        if isinstance(method, SendPhoto):
+            return self._message(bot, method.chat_id, photo=True)
+        return self._message(bot, getattr(method, "chat_id", 0))
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        await self.latency.wait()
+        yield FAKE_JPEG
+
+    def _message(self, bot, chat_id, photo: bool = False) -> Message:
+        message_id = next(self._message_ids)
+        data = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id or 0, "type": "private"},
+        }
+        if photo:
+            data["photo"] = [{"file_id": f"sent{message_id}", "file_unique_id": f"s{message_id}", "width": 320, "height": 480}]
+        return Message.model_validate(data, context={"bot": bot})
+
+
+def install_fakes(args, rng: random.Random, clip_path: str) -> Bot:
+    """Подменяет внешние сервисы в модуле anime на локальные заглушки и возвращает бота"""
+    bot = Bot(
+        token=os.environ["ANIME_BOT"],
+        session=FakeTelegramSession(Latency(args.telegram_ms, args.sigma, rng)),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+
+    yandex_latency = Latency(args.yandex_ms, args.sigma, rng)
+    ytdlp_latency = Latency(args.ytdlp_ms, args.sigma, rng)
+    shikimori_latency = Latency(args.shikimori_ms, args.sigma, rng)
+
+    async def process_image(file):
+        await yandex_latency.wait()
+        if rng.random() > args.hit_rate:
+            return fake_yandex_response(results=0)
+        return fake_yandex_response(results=rng.randint(1, 30), seed=rng.randint(0, 1000))
+
+    async def download_video(url: str):
+        await ytdlp_latency.wait()
+        video_path = f"temp/load_{uuid.uuid4()}.mp4"
+        await asyncio.to_thread(shutil.copyfile, clip_path, video_path)
+        return video_path
+
+    anime.process_image = process_image
+    anime.download_tiktok_video = download_video
+    anime.download_youtube_shorts = download_video
+    anime.parser = FakeShikimori(shikimori_latency, args.hit_rate, rng)
+    return bot
+
+
+class UpdateFactory:
+    """Собирает синтетические апдейты, привязанные к боту"""
+
+    TITLES = ["Frieren", "Chainsaw Man", "Jujutsu Kaisen", "Атака титанов", "Клинок, рассекающий демонов"]
+
+    def __init__(self, bot: Bot, users: int, rng: random.Random):
+        self.bot = bot
+        self.users = users
+        self.rng = rng
+        self._ids = itertools.count(1)
+
+    def build(self, kind: str) -> Update:
+        update_id = next(self._ids)
+        user_id = 10 ** 9 + self.rng.randrange(self.users)
+        user = {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load{user_id}"}
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+        }
+
+        if kind == "photo":
+            message["photo"] = [{"file_id": f"photo{update_id}", "file_unique_id": f"p{update_id}", "width": 1280, "height": 720}]
+        elif kind == "tiktok":
+            message["text"] = f"https://www.tiktok.com/@user/video/{update_id}"
+        elif kind == "shorts":
+            message["text"] = f"https://youtube.com/shorts/{update_id}"
+        elif kind == "anime":
+            message["text"] = f"/anime {self.rng.choice(self.TITLES)}"
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": 6}]
+        elif kind in ("page", "info"):
+            if kind == "page":
+                data = f"page_{self.rng.randint(1, 5)}"
+            else:
+                data = f"info_{anime.result_set_key(FAKE_SEARCH_URL)}_{self.rng.randint(0, 2)}"
+            payload = {
+                "id": str(update_id),
+                "from": user,
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {**message, "from": {"id": 1, "is_bot": True, "first_name": "Bot"}, "text": "results"},
+            }
+            return Update.model_validate({"update_id": update_id, "callback_query": payload}, context={"bot": self.bot})
+        else:
+            raise ValueError(f"Unknown update kind: {kind}")
+
+        return Update.model_validate({"update_id": update_id, "message": message}, context={"bot": self.bot})
+
+
+async def monitor_loop_lag(interval: float, samples: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    os.makedirs("temp", exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as directory:
+        clip_path = os.path.join(directory, "clip.mp4")
+        make_clip(clip_path, 720, 1280, seconds=2, black_seconds=0.1)
+
+        bot = install_fakes(args, rng, clip_path)
+        factory = UpdateFactory(bot, args.users, rng)
+        mix = parse_mix(args.mix)
+        kinds, weights = list(mix), list(mix.values())
+
+        latencies = {kind: [] for kind in kinds}
+        errors = {kind: 0 for kind in kinds}
+        lag_samples = []
+        in_flight = set()
+        max_in_flight = 0
+
+        async def feed(kind: str, update: Update):
+            started = time.perf_counter()
+            try:
+                await anime.dp.feed_update(bot, update)
+            except Exception as e:
+                errors[kind] += 1
+                if args.verbose:
+                    print(f"{kind}: {e!r}")
+            latencies[kind].append(time.perf_counter() - started)
+
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(monitor_loop_lag(args.lag_interval, lag_samples, stop))
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        deadline = started + args.duration
+
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            task = asyncio.create_task(feed(kind, factory.build(kind)))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            max_in_flight = max(max_in_flight, len(in_flight))
+            await asyncio.sleep(rng.expovariate(args.rate))
+
+        sent_for = time.perf_counter() - started
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=args.drain_timeout)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+
+        completed = sum(len(values) for values in latencies.values())
+        return {
+            "config": vars(args),
+            "sent_for_sec": sent_for,
+            "elapsed_sec": elapsed,
+            "completed": completed,
+            "unfinished": len(in_flight),
+            "throughput_per_sec": completed / elapsed if elapsed else 0.0,
+            "max_in_flight": max_in_flight,
+            "telegram_requests": bot.session.requests,
+            "latency_ms": {
+                kind: {
+                    "count": len(values),
+                    "errors": errors[kind],
+                    "p50": percentile(values, 50) * 1000,
+                    "p90": percentile(values, 90) * 1000,
+                    "p99": percentile(values, 99) * 1000,
+                    "max": max(values) * 1000 if values else 0.0,
+                }
+                for kind, values in latencies.items()
+            },
+            "loop_lag_ms": {
+                "p50": percentile(lag_samples, 50) * 1000,
+                "p99": percentile(lag_samples, 99) * 1000,
+                "max": max(lag_samples) * 1000 if lag_samples else 0.0,
+            },
+            "memory_mb": {
+                "rss_before": rss_before,
+                "rss_after": current_rss_mb(),
+                "rss_growth": current_rss_mb() - rss_before,
+                "peak_rss": peak_rss_mb(),
+            },
+        }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--rate", type=float, default=10, help="апдейтов в секунду")
+    arg_parser.add_argument("--duration", type=float, default=30, help="длительность подачи, сек")
+    arg_parser.add_argument("--users", type=int, default=200, help="количество синтетических пользователей")
+    arg_parser.add_argument("--mix", default="photo=4,tiktok=1,shorts=1,anime=2,page=3,info=2")
+    arg_parser.add_argument("--telegram-ms", type=float, default=50, help="медиана задержки Bot API")
+    arg_parser.add_argument("--yandex-ms", type=float, default=1500)
+    arg_parser.add_argument("--shikimori-ms", type=float, default=400)
+    arg_parser.add_argument("--ytdlp-ms", type=float, default=3000)
+    arg_parser.add_argument("--sigma", type=float, default=0.5, help="разброс логнормальной задержки")
+    arg_parser.add_argument("--hit-rate", type=float, default=0.9, help="доля поисков с результатом")
+    arg_parser.add_argument("--lag-interval", type=float, default=0.05, help="период замера задержки event loop")
+    arg_parser.add_argument("--drain-timeout", type=float, default=60, help="сколько ждать незавершенные апдейты")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--report", default="bench_load.json")
+    arg_parser.add_argument("--verbose", action="store_true", help="печатать ошибки хендлеров")
+    args = arg_parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    print(
+        f"Завершено {result['completed']} апдейтов за {result['elapsed_sec']:.1f} с "
+        f"({result['throughput_per_sec']:.1f}/с), незавершенных: {result['unfinished']}, "
+        f"максимум одновременно: {result['max_in_flight']}"
+    )
+    for kind, stats in result["latency_ms"].items():
+        print(
+            f"  {kind:7} n={stats['count']:<6} ошибок={stats['errors']:<4} p50={stats['p50']:8.1f} "
+            f"p90={stats['p90']:8.1f} p99={stats['p99']:8.1f} max={stats['max']:8.1f} мс"
+        )
+    lag = result["loop_lag_ms"]
+    memory = result["memory_mb"]
+    print(f"Задержка event loop: p50={lag['p50']:.1f} p99={lag['p99']:.1f} max={lag['max']:.1f} мс")
+    print(f"Память: RSS {memory['rss_before']:.1f} -> {memory['rss_after']:.1f} МБ, пик {memory['peak_rss']:.1f} МБ")
+
+    write_report(args.report, result)
+    print(f"Отчет: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
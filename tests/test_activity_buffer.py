@@ -0,0 +1,42 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import anime
+from bench.fakes import fake_create_pool
+
+
+class ActivityBufferShutdownTest(unittest.IsolatedAsyncioTestCase):
+    async def test_stop_during_flush_keeps_batch(self):
+        statements = []
+        buffer = anime.ActivityBuffer(flush_interval=0.01)
+        with mock.patch.object(anime, "create_pool", fake_create_pool(latency=0.2, statements=statements)):
+            buffer.start()
+            buffer.add_user(1, "user", "First", None)
+            buffer.add_search(1, "photo", "yandex", 1.5, True)
+            await asyncio.sleep(0.05)  # фоновый flush уже вынул пачку и ждет MySQL
+            await buffer.stop()
+
+        self.assertEqual(len(statements), 2)
+        self.assertIn("INSERT INTO users", statements[0][0])
+        self.assertIn("INSERT INTO searches", statements[1][0])
+        self.assertFalse(buffer._users)
+        self.assertFalse(buffer._searches)
+
+    async def test_cancelled_flush_requeues_batch(self):
+        buffer = anime.ActivityBuffer()
+        with mock.patch.object(anime, "create_pool", fake_create_pool(latency=0.2)):
+            buffer.add_user(1, "user", "First", None)
+            buffer.add_search(1, "photo", "yandex", 1.5, True)
+            flush = asyncio.create_task(buffer.flush())
+            await asyncio.sleep(0.05)
+            flush.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await flush
+
+        self.assertEqual(list(buffer._users), [1])
+        self.assertEqual(len(buffer._searches), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
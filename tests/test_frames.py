@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+import anime
+from bench.frames import legacy_extract, make_clip
+
+
+class FrameIsBlankTest(unittest.TestCase):
+    def test_black_and_flat_frames_are_blank(self):
+        self.assertTrue(anime._frame_is_blank(np.zeros((720, 1280, 3), dtype=np.uint8)))
+        self.assertTrue(anime._frame_is_blank(np.full((720, 1280, 3), 128, dtype=np.uint8)))
+
+    def test_gradient_frame_is_not_blank(self):
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        frame[..., 1] = np.linspace(0, 255, 1280, dtype=np.uint8)
+        self.assertFalse(anime._frame_is_blank(frame))
+
+
+class ExtractFrameTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.intro = os.path.join(cls.directory.name, "intro.mp4")
+        make_clip(cls.intro, 1080, 1920, seconds=2, black_seconds=1.0)
+        cls.black = os.path.join(cls.directory.name, "black.mp4")
+        make_clip(cls.black, 320, 568, seconds=1, black_seconds=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_skips_black_intro_longer_than_ten_frames(self):
+        data = anime._extract_frame(self.intro, 10)
+
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertFalse(anime._frame_is_blank(frame))
+        self.assertEqual(max(frame.shape[:2]), anime.FRAME_MAX_SIDE)
+        # Прежний cap.read() первых 10 кадров секундную заставку не проходил
+        self.assertIsNone(legacy_extract(self.intro, 10))
+
+    def test_stops_after_max_attempts(self):
+        # 0, 250 и 500 мс еще внутри черной заставки
+        self.assertIsNone(anime._extract_frame(self.intro, 3))
+
+    def test_black_clip_gives_no_frame(self):
+        self.assertIsNone(anime._extract_frame(self.black, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
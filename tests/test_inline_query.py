@@ -0,0 +1,74 @@
+import asyncio
+import random
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import anime
+from bench.fakes import FakeShikimori, Latency, fake_anime
+
+
+def inline_query(query_id: str, query: str, user_id: int = 1):
+    return SimpleNamespace(id=query_id, query=query, from_user=SimpleNamespace(id=user_id), answer=mock.AsyncMock())
+
+
+class InlineQueryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        rng = random.Random(0)
+        self.parser = FakeShikimori(Latency(1, 0, rng), hit_rate=1.0, rng=rng)
+        self.cache = anime.ShikimoriCache()
+        for patcher in (mock.patch.object(anime, "parser", self.parser),
+                        mock.patch.object(anime, "shikimori", self.cache),
+                        mock.patch.object(anime, "INLINE_DEBOUNCE", 0.01)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def answer(self, query: str):
+        request = inline_query("1", query)
+        await anime.handle_inline_query(request)
+        request.answer.assert_awaited_once()
+        (results,), kwargs = request.answer.call_args
+        return results, kwargs["cache_time"], kwargs["button"]
+
+    async def test_only_latest_keystroke_is_answered(self):
+        first, second = inline_query("1", "Frie"), inline_query("2", "Frieren")
+        await asyncio.gather(anime.handle_inline_query(first), anime.handle_inline_query(second))
+
+        first.answer.assert_not_awaited()
+        second.answer.assert_awaited_once()
+
+    async def test_exact_hit_is_cached_by_telegram(self):
+        self.cache.put_search("Frieren", [fake_anime("Frieren")])
+        results, cache_time, button = await self.answer("frieren")
+
+        self.assertEqual([result.title for result in results], ["Frieren"])
+        self.assertEqual(cache_time, anime.INLINE_CACHE_TIME)
+        self.assertIsNone(button)
+
+    async def test_miss_starts_search_and_is_not_cached(self):
+        results, cache_time, button = await self.answer("Frieren")
+
+        self.assertEqual(results, [])
+        self.assertEqual(cache_time, 1)
+        self.assertTrue(button.text.startswith("🔍"))
+        await asyncio.gather(*self.cache._fills.values())
+        self.assertEqual(self.parser.calls, [("search", "Frieren")])
+
+    async def test_finished_empty_search_says_nothing_found(self):
+        self.cache.put_search("qwertyuiop", [])
+        results, cache_time, button = await self.answer("qwertyuiop")
+
+        self.assertEqual(results, [])
+        self.assertEqual(cache_time, anime.INLINE_CACHE_TIME)
+        self.assertTrue(button.text.startswith("❌"))
+
+    async def test_short_query_asks_to_keep_typing(self):
+        results, cache_time, button = await self.answer("fr")
+
+        self.assertEqual(cache_time, 1)
+        self.assertTrue(button.text.startswith("✏️"))
+        self.assertEqual(self.parser.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
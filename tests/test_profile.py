@@ -0,0 +1,33 @@
+import unittest
+from collections import Counter
+
+import anime
+
+LOOP = ("main (anime.py:1)", "run (runners.py:118)", "run_forever (base_events.py:641)", "_run_once (base_events.py:1922)")
+
+
+class FormatProfileTest(unittest.TestCase):
+    def test_idle_samples_and_shared_frames_are_not_ranked(self):
+        stacks = Counter({
+            LOOP + ("select (selectors.py:451)",): 90,
+            LOOP + ("_run (events.py:82)", "handle_photo (anime.py:600)", "imencode (anime.py:720)"): 7,
+            LOOP + ("_run (events.py:82)", "flush (anime.py:200)"): 3,
+        })
+        report = anime.format_profile(stacks)
+        own, cumulative = report.split("Суммарное время:")
+
+        self.assertIn("Простой (ожидание событий): 90.0%", report)
+        self.assertNotIn("select", own)
+        self.assertIn("  7.0%  imencode (anime.py:720)", own)
+        self.assertNotIn("run_forever", cumulative)
+        self.assertNotIn("_run (events.py:82)", cumulative)
+        self.assertIn("  7.0%  handle_photo (anime.py:600)", cumulative)
+
+    def test_identical_stacks_keep_their_leaf(self):
+        report = anime.format_profile(Counter({LOOP + ("imencode (anime.py:720)",): 5}))
+
+        self.assertIn("100.0%  imencode (anime.py:720)", report.split("Суммарное время:")[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import anime
+from bench.fakes import FAKE_SEARCH_URL, FakeMessage, fake_yandex_response
+
+
+class ResultInfoTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.resp = fake_yandex_response(results=3, seed=1)
+        self.index = next(i for i, result in enumerate(self.resp.raw) if result.title)
+        self.state = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=1, user_id=1))
+        await self.state.update_data(yandex_response=self.resp)
+
+    async def click(self, search_url: str):
+        callback = SimpleNamespace(
+            data=f"info_{anime.result_set_key(search_url)}_{self.index}",
+            answer=mock.AsyncMock(),
+            message=FakeMessage(),
+            from_user=SimpleNamespace(id=1),
+        )
+        with mock.patch.object(anime, "search_anime_info", mock.AsyncMock()) as search_anime_info:
+            await anime.handle_result_info(callback, self.state)
+        return callback, search_anime_info
+
+    def test_buttons_carry_search_key(self):
+        keyboard = anime.create_pagination_keyboard(FAKE_SEARCH_URL, 1, 1, [0, 1])
+        callbacks = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+
+        key = anime.result_set_key(FAKE_SEARCH_URL)
+        self.assertEqual(callbacks[:2], [f"info_{key}_0", f"info_{key}_1"])
+
+    async def test_click_on_latest_results_opens_info(self):
+        callback, search_anime_info = await self.click(FAKE_SEARCH_URL)
+
+        search_anime_info.assert_awaited_once()
+        self.assertEqual(search_anime_info.call_args.args[1], anime.clean_title(self.resp.raw[self.index].title))
+
+    async def test_click_on_older_results_is_rejected(self):
+        callback, search_anime_info = await self.click("https://yandex.ru/images/search?rpt=imageview&cbir_id=older")
+
+        search_anime_info.assert_not_awaited()
+        callback.answer.assert_awaited_once_with("Результаты поиска устарели, отправьте скриншот заново", show_alert=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
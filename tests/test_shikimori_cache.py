@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+import unittest
+from unittest import mock
+
+import anime
+from bench.fakes import FakeShikimori, Latency, fake_anime
+
+
+def fake_parser(latency_ms: float = 1) -> FakeShikimori:
+    rng = random.Random(0)
+    return FakeShikimori(Latency(latency_ms, 0, rng), hit_rate=1.0, rng=rng)
+
+
+class ShikimoriCacheStoreTest(unittest.TestCase):
+    def test_search_cache_evicts_least_recently_used(self):
+        cache = anime.ShikimoriCache(max_queries=2)
+        cache.put_search("Frieren", [fake_anime("Frieren")])
+        cache.put_search("Chainsaw Man", [fake_anime("Chainsaw Man")])
+        cache.get_search("  frieren ")
+        cache.put_search("Jujutsu Kaisen", [fake_anime("Jujutsu Kaisen")])
+
+        self.assertIsNotNone(cache.get_search("Frieren"))
+        self.assertIsNone(cache.get_search("Chainsaw Man"))
+        self.assertIsNotNone(cache.get_search("Jujutsu Kaisen"))
+
+    def test_entries_expire_after_ttl(self):
+        cache = anime.ShikimoriCache(ttl=60)
+        with mock.patch.object(anime.time, "monotonic", return_value=1000.0):
+            cache.put_search("Frieren", [fake_anime("Frieren")])
+        with mock.patch.object(anime.time, "monotonic", return_value=1059.0):
+            self.assertIsNotNone(cache.get_search("Frieren"))
+        with mock.patch.object(anime.time, "monotonic", return_value=1061.0):
+            self.assertIsNone(cache.get_search("Frieren"))
+
+    def test_lookup_finds_substring_of_cached_titles(self):
+        cache = anime.ShikimoriCache()
+        cache.put_search("frieren", [fake_anime("Sousou no Frieren")])
+
+        self.assertEqual([found["title"] for found in cache.lookup("SOUSOU")], ["Sousou no Frieren"])
+        self.assertEqual(cache.lookup("naruto"), [])
+
+    def test_poster_file_id_is_remembered(self):
+        cache = anime.ShikimoriCache()
+        cache.put_file_id("https://shikimori.one/posters/1.jpg", "AgAC1")
+
+        self.assertEqual(cache.get_file_id("https://shikimori.one/posters/1.jpg"), "AgAC1")
+        self.assertIsNone(cache.get_file_id("https://shikimori.one/posters/2.jpg"))
+        self.assertIsNone(cache.get_file_id(None))
+
+
+class ShikimoriFillTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.parser = fake_parser()
+        for patcher in (mock.patch.object(anime, "parser", self.parser),
+                        mock.patch.object(anime, "SHIKIMORI_FILL_INTERVAL", 0)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cache = anime.ShikimoriCache()
+
+    async def wait_fills(self):
+        await asyncio.gather(*self.cache._fills.values())
+
+    async def test_short_query_is_not_searched(self):
+        self.assertFalse(self.cache.fill("fr", 1))
+        self.assertFalse(self.cache._fills)
+
+    async def test_newer_query_replaces_pending_one(self):
+        for prefix in ("fri", "frie", "frieren"):
+            self.assertTrue(self.cache.fill(prefix, 1))
+        await self.wait_fills()
+
+        self.assertEqual(self.parser.calls, [("search", "frieren")])
+        self.assertIsNotNone(self.cache.get_search("frieren"))
+
+    async def test_pending_fills_are_capped(self):
+        with mock.patch.object(anime, "SHIKIMORI_FILL_QUEUE", 2):
+            self.assertTrue(self.cache.fill("frieren", 1))
+            self.assertTrue(self.cache.fill("chainsaw", 2))
+            self.assertFalse(self.cache.fill("jujutsu", 3))
+            self.assertTrue(self.cache.fill("frieren sousou", 1))
+        await self.wait_fills()
+
+        self.assertEqual(len(self.parser.calls), 2)
+
+    async def test_failed_fill_pauses_searches(self):
+        with mock.patch.object(self.parser, "search", side_effect=RuntimeError("429")), \
+                self.assertLogs(anime.logger, "ERROR"):
+            self.cache.fill("frieren", 1)
+            await self.wait_fills()
+
+        self.assertFalse(self.cache.fill("chainsaw", 2))
+
+    async def test_fills_do_not_take_user_slots(self):
+        self.parser.latency = Latency(100, 0, random.Random(0))
+        for user_id in range(anime.SHIKIMORI_USER_CONCURRENCY + 1):
+            self.cache.fill(f"title {user_id}", user_id)
+        await asyncio.sleep(0)
+
+        started = time.monotonic()
+        await self.cache.search("frieren")
+        self.assertLess(time.monotonic() - started, 0.18)
+        await self.wait_fills()
+
+
+class ShikimoriPrefetchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.parser = fake_parser(latency_ms=20)
+        patcher = mock.patch.object(anime, "parser", self.parser)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_cache(self, concurrency: int = anime.SHIKIMORI_PREFETCH_CONCURRENCY, interval: float = 0):
+        with mock.patch.object(anime, "SHIKIMORI_PREFETCH_CONCURRENCY", concurrency), \
+                mock.patch.object(anime, "SHIKIMORI_PREFETCH_INTERVAL", interval):
+            return anime.ShikimoriCache()
+
+    async def wait_prefetch(self, cache):
+        await asyncio.gather(*[task for key, task in cache._pending.items() if key[0] == "prefetch"])
+
+    async def test_title_is_resolved_before_next_one(self):
+        cache = self.make_cache(concurrency=1)
+        for title in ("Frieren", "Chainsaw Man"):
+            cache.prefetch(title, chat_id=1)
+        await self.wait_prefetch(cache)
+
+        self.assertEqual([kind for kind, _ in self.parser.calls], ["search", "info", "search", "info"])
+        self.assertIsNotNone(cache.get_info(fake_anime("Frieren")["link"]))
+
+    async def test_queue_is_capped_per_chat(self):
+        cache = self.make_cache()
+        with mock.patch.object(anime, "SHIKIMORI_PREFETCH_PER_CHAT", 2):
+            for title in ("Frieren", "Chainsaw Man", "Jujutsu Kaisen"):
+                cache.prefetch(title, chat_id=1)
+            cache.prefetch("Naruto", chat_id=2)
+
+        queued = sorted(key[1] for key in cache._pending if key[0] == "prefetch")
+        self.assertEqual(queued, ["chainsaw man", "frieren", "naruto"])
+        await self.wait_prefetch(cache)
+        self.assertFalse(cache._prefetch_chats)
+
+    async def test_user_request_joins_prefetch_in_flight(self):
+        cache = self.make_cache()
+        cache.prefetch("Frieren", chat_id=1)
+        await asyncio.sleep(0.01)  # поиск предзагрузки уже ушел в сеть
+
+        await cache.search("Frieren")
+        await self.wait_prefetch(cache)
+        self.assertEqual(self.parser.calls.count(("search", "Frieren")), 1)
+
+    async def test_user_request_overtakes_queued_prefetch(self):
+        cache = self.make_cache(interval=10)
+        cache.prefetch("Frieren", chat_id=1)
+        cache.prefetch("Chainsaw Man", chat_id=1)
+        await asyncio.sleep(0.01)  # второй поиск ждет паузы фоновой очереди
+
+        results = await asyncio.wait_for(cache.search("Chainsaw Man"), timeout=1)
+        self.assertEqual(results, [fake_anime("Chainsaw Man")])
+        self.assertEqual(self.parser.calls.count(("search", "Chainsaw Man")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()